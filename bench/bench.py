@@ -0,0 +1,452 @@
+"""
+AURA Bot — офлайн-бенчмарк
+Один локальный сервер изображает Supabase (PostgREST + Storage), Telegram Bot API
+и источник аудио (HTML-страница с <audio> и обложкой — её разбирает generic-экстрактор
+yt-dlp). bot.py запускается отдельным процессом, как в проде, и получает апдейты
+через /webhook/telegram; задержка команды — от POST апдейта до ответа бота в фейковый
+Telegram. В конце — пропускная способность, p50/p99 и пиковый RSS бота с воркерами.
+
+    python bench/bench.py --tracks 5000 --concurrency 16 --requests 200 --downloads 8
+    python bench/bench.py --scenarios status,callback --json out.json
+"""
+import os
+import re
+import sys
+import json
+import base64
+import time
+import shutil
+import socket
+import random
+import asyncio
+import argparse
+import fnmatch
+import tempfile
+import itertools
+import urllib.parse
+from pathlib import Path
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+BOT_PY   = Path(__file__).resolve().parent.parent / "bot.py"
+TOKEN    = "1000:bench"
+ADMIN    = 777
+SECRET   = "bench_secret"
+SCENARIOS = ("status", "tracks", "find", "callback", "delete", "track_added", "download", "download_batch")
+DONE_RE  = re.compile(r"^(✅|♻️|❌|🚫)")   # финальные статусы задачи скачивания
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ──────────────────────────────────────────────────────────
+#  ФЕЙКОВЫЙ POSTGREST
+# ──────────────────────────────────────────────────────────
+def _split(s: str) -> list[str]:
+    """Запятые верхнего уровня: вложенные скобки и кавычки не режем."""
+    out, cur, depth, quoted = [], "", 0, False
+    for ch in s:
+        if ch == '"': quoted = not quoted
+        elif not quoted and ch == "(": depth += 1
+        elif not quoted and ch == ")": depth -= 1
+        if ch == "," and not depth and not quoted: out.append(cur); cur = ""
+        else: cur += ch
+    return out + [cur] if cur else out
+
+def _cond(col: str, expr: str):
+    neg = expr.startswith("not.")
+    op, _, val = expr.removeprefix("not.").partition(".")
+    if op == "in":
+        items = {x.strip('"') for x in _split(val[1:-1])}
+        test = lambda v: v is not None and str(v) in items
+    elif op == "is":
+        test = lambda v: v is None if val == "null" else v == (val == "true")
+    elif op == "ilike":
+        pat = val.strip('"').lower()
+        test = lambda v: v is not None and fnmatch.fnmatch(str(v).lower(), pat)
+    else:
+        val = val.strip('"')
+        cmp = {"eq": lambda a, b: a == b, "neq": lambda a, b: a != b, "gt": lambda a, b: a > b,
+               "lt": lambda a, b: a < b, "gte": lambda a, b: a >= b, "lte": lambda a, b: a <= b}[op]
+        def test(v):
+            if v is None: return False
+            if isinstance(v, bool): return cmp(v, val == "true")
+            return cmp(v, type(v)(val)) if isinstance(v, (int, float)) else cmp(str(v), val)
+    return lambda r: test(r.get(col)) != neg
+
+def _term(t: str):
+    if t.startswith(("and(", "or(")):
+        name, _, rest = t.partition("(")
+        return _logic("(" + rest, all if name == "and" else any)
+    col, _, expr = t.partition(".")
+    return _cond(col, expr)
+
+def _logic(expr: str, conj):
+    terms = [_term(t) for t in _split(expr[1:-1])]
+    return lambda r: conj(f(r) for f in terms)
+
+def _order(rows: list, order: str) -> list:
+    for part in reversed(order.split(",")):
+        col, *mods = part.split(".")
+        desc = "desc" in mods
+        nf = "nullsfirst" in mods if any(m.startswith("nulls") for m in mods) else desc
+        null_g = int(nf) if desc else int(not nf)
+        rows.sort(key=lambda r: (null_g, 0) if r.get(col) is None else (1 - null_g, r[col]), reverse=desc)
+    return rows
+
+
+class FakeSupabase:
+    def __init__(self, tracks: int, base: str):
+        self.base = base
+        self.ids = itertools.count(1)
+        self.tracks: dict[int, dict] = {}
+        self.settings = {1: {"id": 1, "blocked": False}}
+        self.objects: dict[str, int] = {}
+        self.tus: dict[str, dict] = {}
+        rnd = random.Random(1)
+        words = "night city river echo neon dust gold glass ocean fire velvet static".split()
+        for _ in range(tracks):
+            self._new({"title": " ".join(rnd.sample(words, 3)).title(), "artist": f"Artist {rnd.randint(1, 300)}",
+                       "duration": rnd.randint(90, 420), "play_count": rnd.randint(0, 5000),
+                       "audio_url": f"{base}/storage/v1/object/public/tracks/audio/seed.mp3", "art_url": None})
+
+    def _new(self, row: dict) -> dict:
+        tid = next(self.ids)
+        row = {"id": tid, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(1.7e9 + tid)),
+               "favorite": False, "art_thumb_url": None, "source_id": None, "content_hash": None, **row}
+        self.tracks[tid] = row
+        return row
+
+    def select(self, table: str, params) -> list[dict]:
+        if table == "track_stats":
+            return [{"plays": sum(r.get("play_count") or 0 for r in self.tracks.values())}]
+        rows = list((self.settings if table == "settings" else self.tracks).values())
+        for k, v in params.multi_items():
+            if k == "or": f = _logic(v, any)
+            elif k in ("select", "order", "limit", "offset", "on_conflict"): continue
+            else: f = _cond(k, v)
+            rows = [r for r in rows if f(r)]
+        if "order" in params: rows = _order(rows, params["order"])
+        rows = rows[int(params.get("offset", 0)):]
+        if "limit" in params: rows = rows[:int(params["limit"])]
+        sel = params.get("select", "*")
+        return rows if sel == "*" else [{c: r.get(c) for c in sel.split(",")} for r in rows]
+
+    async def rest(self, table: str, req: Request) -> Response:
+        q = req.query_params
+        if req.method == "HEAD":
+            n = len(self.select(table, q))
+            return Response(headers={"Content-Range": f"0-{n - 1}/{n}" if n else "*/0"})
+        if req.method == "GET":
+            return JSONResponse(self.select(table, q))
+        if req.method == "DELETE":
+            ids = {r["id"] for r in self.select(table, q)} if table == "tracks" else set()
+            for i in ids: del self.tracks[i]
+            return Response(status_code=204)
+        body = await req.json()
+        rows = body if isinstance(body, list) else [body]
+        if table == "settings":
+            for r in rows: self.settings.setdefault(r["id"], {}).update(r)
+            return Response(status_code=201)
+        known = {r["source_id"] for r in self.tracks.values() if r.get("source_id")}
+        out = []
+        for r in rows:
+            if r.get("source_id") in known:
+                if "ignore-duplicates" in req.headers.get("prefer", ""): continue
+                return JSONResponse({"code": "23505", "message": "duplicate key value"}, 409)
+            known.add(r.get("source_id"))
+            out.append(self._new(dict(r)))
+        return JSONResponse(out, 201)
+
+    async def storage(self, path: str, req: Request) -> Response:
+        if req.method == "DELETE":   # bulk remove: {"prefixes": [...]}
+            names = (await req.json()).get("prefixes", [])
+            gone = [{"name": n} for n in names if self.objects.pop(n, None) is not None]
+            return JSONResponse(gone)
+        if path == "upload/resumable" and req.method == "POST":
+            uid = f"{len(self.tus) + 1:08d}"
+            meta = dict(kv.split(" ") for kv in req.headers.get("upload-metadata", "").split(",") if " " in kv)
+            self.tus[uid] = {"size": int(req.headers["upload-length"]) if "upload-length" in req.headers else None,
+                             "name": base64.b64decode(meta.get("objectName", "")).decode(), "offset": 0}
+            return Response(status_code=201, headers={"Location": f"{self.base}/storage/v1/upload/resumable/{uid}"})
+        if path.startswith("upload/resumable/"):
+            up = self.tus[path.rsplit("/", 1)[1]]
+            if req.method == "PATCH":
+                if int(req.headers["upload-offset"]) != up["offset"]: return Response(status_code=409)
+                if "upload-length" in req.headers: up["size"] = int(req.headers["upload-length"])
+                async for chunk in req.stream(): up["offset"] += len(chunk)
+                if up["offset"] == up["size"]: self.objects[up["name"]] = up["size"]
+            return Response(status_code=204 if req.method == "PATCH" else 200,
+                            headers={"Upload-Offset": str(up["offset"]), "Tus-Resumable": "1.0.0"})
+        size = 0
+        async for chunk in req.stream(): size += len(chunk)
+        self.objects[path.split("/", 2)[2]] = size   # object/<bucket>/<name>
+        return JSONResponse({"Key": path})
+
+
+# ──────────────────────────────────────────────────────────
+#  ФЕЙКОВЫЙ TELEGRAM BOT API
+# ──────────────────────────────────────────────────────────
+class FakeTelegram:
+    ME = {"id": 1000, "is_bot": True, "first_name": "AURA Bench", "username": "aura_bench_bot"}
+
+    def __init__(self):
+        self.msg_ids = itertools.count(1)
+        self.waiters: dict[int, tuple] = {}   # chat_id → (predicate(method, text), future)
+        self.calls: dict[str, int] = {}
+
+    def wait(self, chat_id: int, pred) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters[chat_id] = (pred, fut)
+        return fut
+
+    async def call(self, method: str, req: Request) -> JSONResponse:
+        # PTB шлёт form-urlencoded (значения-объекты — JSON-строками); python-multipart не нужен
+        body = (await req.body()).decode()
+        data = json.loads(body) if body.startswith("{") else dict(urllib.parse.parse_qsl(body))
+        self.calls[method] = self.calls.get(method, 0) + 1
+        result = {"getMe": self.ME, "getMyCommands": [], "getWebhookInfo": {"url": "", "has_custom_certificate": False,
+                  "pending_update_count": 0}}.get(method, True)
+        if method in ("sendMessage", "editMessageText"):
+            chat = int(data.get("chat_id", 0))
+            result = {"message_id": int(data.get("message_id") or next(self.msg_ids)), "date": int(time.time()),
+                      "chat": {"id": chat, "type": "group", "title": "bench"}, "from": self.ME,
+                      "text": data.get("text", "")}
+            if (w := self.waiters.get(chat)) and w[0](method, data.get("text", "")):
+                del self.waiters[chat]
+                if not w[1].done(): w[1].set_result(None)
+        return JSONResponse({"ok": True, "result": result})
+
+
+# ──────────────────────────────────────────────────────────
+#  СИНТЕТИЧЕСКИЙ ИСТОЧНИК
+# ──────────────────────────────────────────────────────────
+def media_app(app: FastAPI, base: str, audio: bytes, art: bytes):
+    @app.get("/media/{n}.html")
+    async def page(n: str):
+        return Response(
+            f'<html><head><title>{n}</title><meta property="og:title" content="Synthetic {n}">'
+            f'<meta property="og:image" content="{base}/media/art.jpg"></head>'
+            f'<body><audio src="{base}/media/{n}.mp3"></audio></body></html>', media_type="text/html")
+
+    @app.get("/media/{n}.mp3")
+    async def mp3(n: str):
+        # у каждого трека свои байты — иначе все после первого отсеет дедупликация по content_hash
+        return Response(audio[:10] + n.encode().ljust(64) + audio[10:], media_type="audio/mpeg")
+
+    @app.get("/media/art.jpg")
+    async def cover():
+        return Response(art, media_type="image/jpeg")
+
+
+def build_fake(tracks: int, base: str, audio_kb: int) -> tuple[FastAPI, FakeSupabase, FakeTelegram]:
+    app, sb, tg = FastAPI(), FakeSupabase(tracks, base), FakeTelegram()
+    rnd = random.Random(2)
+    media_app(app, base, b"ID3\x03\x00\x00\x00\x00\x00\x00" + rnd.randbytes(audio_kb * 1024), rnd.randbytes(40_000))
+    app.api_route("/rest/v1/{table}", methods=["GET", "HEAD", "POST", "DELETE", "PATCH"])(sb.rest)
+    app.api_route("/storage/v1/{path:path}", methods=["GET", "HEAD", "POST", "PATCH", "DELETE"])(sb.storage)
+
+    @app.post("/bot{token}/{method}")
+    async def bot_api(method: str, req: Request):
+        return await tg.call(method, req)
+    return app, sb, tg
+
+
+# ──────────────────────────────────────────────────────────
+#  НАГРУЗКА
+# ──────────────────────────────────────────────────────────
+def _rss(pid: int) -> int:
+    """RSS процесса и всех потомков (пул yt-dlp, менеджер, ffmpeg), КБ; только Linux /proc."""
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            total += int(re.search(r"VmRSS:\s+(\d+)", Path(f"/proc/{p}/status").read_text()).group(1))
+            for t in Path(f"/proc/{p}/task").iterdir():
+                stack += map(int, (t / "children").read_text().split())
+        except (OSError, AttributeError):
+            pass
+    return total
+
+
+class Bench:
+    def __init__(self, args, tg: FakeTelegram, sb: FakeSupabase, bot_url: str, fake_url: str):
+        self.args, self.tg, self.sb = args, tg, sb
+        self.bot_url, self.fake_url = bot_url, fake_url
+        self.http = httpx.AsyncClient(base_url=bot_url, timeout=30,
+                                      limits=httpx.Limits(max_connections=args.concurrency + 4))
+        self.update_ids = itertools.count(1)
+        self.chats = itertools.count(1)
+        self.acks: list[float] = []
+        self.ids: list[int] = []
+        self.results = {}
+
+    def _update(self, chat: int, text: str = None, data: str = None) -> dict:
+        uid = next(self.update_ids)
+        msg = {"message_id": uid, "date": int(time.time()), "chat": {"id": chat, "type": "group", "title": "bench"},
+               "from": {"id": ADMIN, "is_bot": False, "first_name": "Admin"}}
+        if data is not None:
+            return {"update_id": uid, "callback_query": {"id": str(uid), "from": msg["from"], "chat_instance": "b",
+                                                          "data": data, "message": {**msg, "text": "…"}}}
+        cmd = text.split()[0]
+        return {"update_id": uid, "message": {**msg, "text": text,
+                                              "entities": [{"type": "bot_command", "offset": 0, "length": len(cmd)}]}}
+
+    async def command(self, text: str = None, data: str = None, pred=None, timeout=60.0):
+        """Апдейт в /webhook/telegram → ждём ответ бота в фейковый Telegram."""
+        chat = -next(self.chats)
+        done = self.tg.wait(chat, pred or (lambda m, t: True))
+        t0 = time.perf_counter()
+        r = await self.http.post("/webhook/telegram", json=self._update(chat, text, data),
+                                 headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+        self.acks.append((time.perf_counter() - t0) * 1000)
+        r.raise_for_status()
+        try:
+            await asyncio.wait_for(done, timeout)
+        finally:
+            self.tg.waiters.pop(chat, None)
+
+    async def track_added(self, i: int):
+        rec = {"id": 10_000_000 + i, "title": f"Hook {i}", "artist": "Bench", "duration": 200, "play_count": 0}
+        etype = ("INSERT", "UPDATE", "DELETE")[i % 3]
+        body = {"type": etype, "table": "tracks", "record": None if etype == "DELETE" else rec,
+                "old_record": None if etype == "INSERT" else {**rec, "title": "old"}}
+        r = await self.http.post("/webhook/track-added", json=body, headers={"x-webhook-secret": SECRET})
+        r.raise_for_status()
+
+    def job(self, name: str, i: int):
+        ids, step = self.ids, self.args.delete_size
+        return {
+            "status":   lambda: self.command("/status"),
+            "tracks":   lambda: self.command(f"/tracks {('new', 'top', 'long')[i % 3]}"),
+            "find":     lambda: self.command(f"/find {('neon', 'river gold', 'artist 1', 'zz')[i % 4]}"),
+            "callback": lambda: self.command(data=("tr:new", "tr:top", "tr:long", "status", "toggle_block")[i % 5],
+                                             pred=lambda m, t: m == "editMessageText"),
+            "delete":   lambda: self.command(f"/delete {ids[i * step]}-{ids[i * step + step - 1]}"),
+            "track_added": lambda: self.track_added(i),
+            "download": lambda: self.command(f"/download {self.fake_url}/media/s{i}-{time.time_ns()}.html",
+                                             pred=lambda m, t: bool(DONE_RE.match(t)), timeout=300),
+            "download_batch": lambda: self.command(
+                "/download " + " ".join(f"{self.fake_url}/media/b{i}-{k}-{time.time_ns()}.html"
+                                        for k in range(self.args.batch)),
+                pred=lambda m, t: bool(DONE_RE.match(t)), timeout=600),
+        }[name]
+
+    async def run(self, name: str, n: int, concurrency: int):
+        if name == "delete":   # диапазоны id фиксируем заранее: параллельные удаления не сдвигают друг друга
+            self.ids = sorted(self.sb.tracks)
+            n = min(n, len(self.ids) // self.args.delete_size)
+        lat, errors, it = [], [], iter(range(n))
+
+        async def worker():
+            for i in it:
+                t0 = time.perf_counter()
+                try:
+                    await self.job(name, i)()
+                    lat.append((time.perf_counter() - t0) * 1000)
+                except Exception as e:
+                    errors.append(repr(e))
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+        lat.sort()
+        pct = lambda p: round(lat[min(len(lat) - 1, int(len(lat) * p))], 1) if lat else None
+        self.results[name] = {"n": n, "errors": len(errors), "concurrency": concurrency,
+                              "rps": round(len(lat) / wall, 1) if wall else 0,
+                              "p50_ms": pct(0.5), "p99_ms": pct(0.99), "max_ms": pct(1)}
+        if errors: print(f"  {name}: {len(errors)} ошибок, первая: {errors[0]}", file=sys.stderr)
+
+
+async def main(args):
+    fport, bport = free_port(), free_port()
+    fake_url, bot_url = f"http://127.0.0.1:{fport}", f"http://127.0.0.1:{bport}"
+    app, sb, tg = build_fake(args.tracks, fake_url, args.audio_kb)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=fport, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started: await asyncio.sleep(0.05)
+
+    # копия bot.py во временной папке: рядом нет youtube_cookies.txt, yt-dlp не трогает настоящий
+    tmp = Path(tempfile.mkdtemp(prefix="aura-bench-"))
+    shutil.copy(BOT_PY, tmp / "bot.py")
+    env = {**os.environ, "BOT_TOKEN": TOKEN, "ADMIN_CHAT_ID": str(ADMIN), "SB_URL": fake_url, "SB_KEY": "bench",
+           "WEBHOOK_SECRET": SECRET, "TG_SECRET": SECRET, "PORT": str(bport), "PUBLIC_URL": "",
+           "TG_API_URL": f"{fake_url}/bot", "JOB_WORKERS": str(args.job_workers)}
+    with open(tmp / "bot.log", "w") as logf:
+        proc = await asyncio.create_subprocess_exec(sys.executable, "bot.py", cwd=tmp, env=env,
+                                                    stdout=logf, stderr=logf)
+    peak, bench = 0, None
+    try:
+        # первый ответ / — порт обслуживается; status=ok — бот готов принимать апдейты
+        t0, first = time.perf_counter(), None
+        async with httpx.AsyncClient(timeout=30) as c:
+            while True:
+                if proc.returncode is not None: raise SystemExit(f"bot.py упал, лог: {tmp / 'bot.log'}")
+                try:
+                    r = await c.get(bot_url)
+                    first = first or time.perf_counter() - t0
+                    if r.json().get("status") == "ok": break
+                except httpx.TransportError: pass
+                await asyncio.sleep(0.02)
+        boot = time.perf_counter() - t0
+
+        async def sample():
+            nonlocal peak
+            while True:
+                peak = max(peak, _rss(proc.pid))
+                await asyncio.sleep(0.2)
+        sampler = asyncio.create_task(sample())
+
+        bench = Bench(args, tg, sb, bot_url, fake_url)
+        for name in args.scenarios:
+            n = {"download": args.downloads, "download_batch": 1 if args.batch else 0}.get(name, args.requests)
+            if not n: continue
+            print(f"▶ {name} ×{n}", file=sys.stderr)
+            await bench.run(name, n, 1 if name == "download_batch" else args.concurrency)
+        sampler.cancel()
+        metrics = (await bench.http.get("/metrics")).json()
+    finally:
+        if proc.returncode is None: proc.terminate()
+        await proc.wait()
+        if bench: await bench.http.aclose()
+        server.should_exit = True
+        await serve
+
+    acks = sorted(bench.acks)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "listen_s": round(first, 2), "boot_s": round(boot, 2), "peak_rss_mb": round(peak / 1024, 1),
+        "webhook_ack_ms": {"p50": round(acks[len(acks) // 2], 2), "p99": round(acks[int(len(acks) * 0.99)], 2)} if acks else None,
+        "scenarios": bench.results, "bot_metrics": metrics,
+    }
+    print(f"\n{'сценарий':<16}{'n':>6}{'ошибок':>8}{'req/s':>9}{'p50 мс':>10}{'p99 мс':>10}")
+    for name, r in bench.results.items():
+        print(f"{name:<16}{r['n']:>6}{r['errors']:>8}{r['rps']:>9}{r['p50_ms'] or '-':>10}{r['p99_ms'] or '-':>10}")
+    print(f"\nпорт отвечает через {report['listen_s']} с, готов через {report['boot_s']} с · пиковый RSS (бот + воркеры) {report['peak_rss_mb']} МБ"
+          f" · ack вебхука p50/p99 {report['webhook_ack_ms']}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=1))
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Офлайн-бенчмарк bot.py на фейковых Supabase/Telegram/yt-dlp")
+    ap.add_argument("--tracks", type=int, default=2000, help="размер каталога в фейковом Supabase")
+    ap.add_argument("--requests", type=int, default=200, help="запросов на сценарий (кроме скачиваний)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--downloads", type=int, default=6, help="одиночных /download")
+    ap.add_argument("--batch", type=int, default=10, help="ссылок в одном пакетном /download (0 — пропустить)")
+    ap.add_argument("--delete-size", type=int, default=5, help="треков в одном /delete")
+    ap.add_argument("--audio-kb", type=int, default=512, help="размер синтетического трека")
+    ap.add_argument("--job-workers", type=int, default=2)
+    ap.add_argument("--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS))
+    ap.add_argument("--json", help="сохранить отчёт (вместе с /metrics бота) в файл")
+    args = ap.parse_args()
+    if unknown := set(args.scenarios) - set(SCENARIOS): ap.error(f"неизвестные сценарии: {unknown}")
+    asyncio.run(main(args))
@@ -28,7 +28,8 @@ create policy "allow_all" on settings
   for all using (true) with check (true);
 
 
--- 2. ТРИГГЕР — уведомление при добавлении трека
+-- 2. ТРИГГЕР — уведомления и синхронизация зеркала каталога в боте
+--    INSERT/UPDATE/DELETE в tracks и изменения settings
 --    Требует расширение pg_net (уже есть в Supabase)
 -- ──────────────────────────────────────────────
 -- Замени URL и секрет на свои!
@@ -42,29 +43,65 @@ declare
 begin
   perform net.http_post(
     url     := bot_url,
-    body    := json_build_object(
-                 'id',     NEW.id,
-                 'title',  NEW.title,
-                 'artist', NEW.artist
-               )::text,
-    headers := json_build_object(
+    body    := jsonb_build_object(
+                 'type',       TG_OP,
+                 'table',      TG_TABLE_NAME,
+                 'record',     case when TG_OP <> 'DELETE' then to_jsonb(NEW) - 'pw_hash' end,
+                 'old_record', case when TG_OP <> 'INSERT' then to_jsonb(OLD) - 'pw_hash' end
+               ),
+    headers := jsonb_build_object(
                  'Content-Type',      'application/json',
                  'x-webhook-secret',  secret
-               )::jsonb
+               )
   );
-  return NEW;
+  return coalesce(NEW, OLD);
 end;
 $$;
 
--- Удаляем старый триггер если есть
+-- Удаляем старые триггеры если есть
 drop trigger if exists trg_track_added on tracks;
+drop trigger if exists trg_settings_changed on settings;
 
--- Создаём триггер
+-- Создаём триггеры
+-- UPDATE — только по колонкам, которые видны в боте; play_count меняется на каждое
+-- прослушивание, его зеркало подтягивает периодической сверкой (CATALOG_SYNC)
 create trigger trg_track_added
-  after insert on tracks
+  after insert or delete or update of title, artist, duration, audio_url, art_url, art_thumb_url on tracks
   for each row
   execute procedure notify_track_added();
 
+create trigger trg_settings_changed
+  after update on settings
+  for each row
+  execute procedure notify_track_added();
+
+
+-- 3. ДЕДУПЛИКАЦИЯ /download
+--    source_id — канонический ID источника (youtube:<id>, soundcloud:<id>)
+--    content_hash — sha256 скачанного исходного файла (до перекодирования в MP3)
+-- ──────────────────────────────────────────────
+alter table tracks add column if not exists source_id    text;
+alter table tracks add column if not exists content_hash text;
+
+create unique index if not exists tracks_source_id_key   on tracks (source_id);
+create index        if not exists tracks_content_hash_idx on tracks (content_hash);
+
+
+-- 4. АГРЕГАТЫ ДЛЯ /status
+--    Сумма прослушиваний считается в Postgres, а не в боте
+-- ──────────────────────────────────────────────
+create or replace view track_stats as
+  select coalesce(sum(play_count), 0)::bigint as plays
+  from tracks;
+
+grant select on track_stats to anon, authenticated;
+
+
+-- 5. ОБЛОЖКИ
+--    art_url — обложка 600×600, art_thumb_url — миниатюра 160×160 для списков
+-- ──────────────────────────────────────────────
+alter table tracks add column if not exists art_thumb_url text;
+
 
 -- ══════════════════════════════════════════════════════════════
 --  ГОТОВО. После деплоя бота: